@@ -172,13 +172,30 @@ class PlacementEvaluator:
             self.get_score_one_sol = self.get_goodput_simulation
             self.get_stats_one_sol = self.get_stats_simulation
 
+        # Dict[placement signature -> score]
+        self.score_cache = {}
+
+    @staticmethod
+    def get_signature(sol: ModelPlacement):
+        """The order of models within a group does not change the score."""
+        return tuple((c, frozenset(ms))
+                     for c, ms in zip(sol.group_configs, sol.group_models))
+
     def get_scores(self, sols: List[ModelPlacement]):
+        # Only evaluate the placements that are not in the cache
+        sigs = [self.get_signature(sol) for sol in sols]
+        todo = {}
+        for sig, sol in zip(sigs, sols):
+            if sig not in self.score_cache and sig not in todo:
+                todo[sig] = sol
+
         scores = [self.get_score_one_sol(sol, self.model_datas,
-            self.cluster_env, self.workload, self.method) for sol in sols]
+            self.cluster_env, self.workload, self.method) for sol in todo.values()]
 
         if self.parallel:
             scores = ray.get(scores)
-        return scores
+        self.score_cache.update(zip(todo.keys(), scores))
+        return [self.score_cache[sig] for sig in sigs]
 
     def get_stats(self, sols: List[ModelPlacement]):
         stats = [self.get_stats_one_sol(sol, self.model_datas,
@@ -1,9 +1,12 @@
 """Selective replication with model parallelism."""
 from collections import namedtuple
-from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, partial
 import logging
 import math
 import multiprocessing
+import os
 import time
 from typing import List, Tuple
 
@@ -33,17 +36,26 @@ def compute_capability(model_data, parallel_config, max_bs):
     if latency_mem is None:
         return 0
 
-    num_stages = parallel_config.pp
-    max_cap = 0
-    for b, ls in latency_mem.latency.items():
-        if b > max_bs:
-            continue
+    # The cache lives on the latency table, so it is dropped together with
+    # the table and cleared when the table is updated.
+    cache = latency_mem.get_capability_cache()
+    key = (slo, max_bs)
+    if key in cache:
+        return cache[key]
 
+    num_stages = parallel_config.pp
+    batch_sizes, sum_ls, max_ls = latency_mem.get_latency_arrays()
+    mask = batch_sizes <= max_bs
+    if np.any(mask):
         # slo = sum(ls) + (n-1) * max(ls)
         # so, n = ceil((slo - sum(ls)) / max(ls)) + 1
-        max_cap = max(max_cap, (slo - sum(ls)) // max(ls) + 1)
+        max_cap = max(0, np.max((slo - sum_ls[mask]) // max_ls[mask] + 1))
+    else:
+        max_cap = 0
 
-    return max_cap * (0.99 ** num_stages)
+    ret = max_cap * (0.99 ** num_stages)
+    cache[key] = ret
+    return ret
 
 
 class ModelParallelismILP(BasePlacementPolicy):
@@ -54,6 +66,13 @@ class ModelParallelismILP(BasePlacementPolicy):
         self.sum_k = 1e-4
         self.max_bs = 1
 
+        # CBC parameters. See python-mip's Model.preprocess, Model.cuts
+        # and Model.emphasis. Turning the cuts off makes CBC much slower
+        # to prove optimality on this problem, so leave them on auto.
+        self.preprocess = 1
+        self.cuts = -1
+        self.emphasis = 0
+
         # Hard coded for now. Expose this as parameters later
         self.group_configs = [
             ParallelConfig(0, 0, 0),
@@ -63,9 +82,13 @@ class ModelParallelismILP(BasePlacementPolicy):
             ParallelConfig(1, 1, 8),
         ]
         self.group_sizes = [
-            np.prod(x) for x in self.group_configs
+            x.dp * x.op * x.pp for x in self.group_configs
         ]
 
+        # The structure and the solution of the last solved problem.
+        # Used to warm start the solver when only the rates change.
+        self.warm_start = None
+
     def compute_max_stage_mem(self, model_data, parallel_config, mem_budget):
         latency_mem = model_data.profiling_result.para_dict.get(parallel_config, None)
 
@@ -78,8 +101,7 @@ class ModelParallelismILP(BasePlacementPolicy):
                         model_datas: List[ModelData],
                         cluster_env: ClusterEnv,
                         train_workload: Workload = None):
-        import pulp
-        from pulp import LpVariable, LpProblem, LpMaximize, lpSum, LpStatus
+        from mip import Model, BINARY, MAXIMIZE, OptimizationStatus, xsum
 
         tic = time.time()
 
@@ -94,113 +116,126 @@ class ModelParallelismILP(BasePlacementPolicy):
         G = cluster_env.num_devices
         K = len(self.group_configs)
         g = self.group_sizes
-        f = np.zeros((N, K))
-        d = np.zeros((N, K))
-        for i in range(N):
-            model_data = model_datas[i]
-            for k in range(K):
-                parallel_config = self.group_configs[k]
-                f[i][k] = compute_capability(model_data, parallel_config, self.max_bs)
-                d[i][k] = self.compute_max_stage_mem(
-                    model_data, parallel_config, cluster_env.mem_budget)
+        f = np.empty((N, K))
+        d = np.empty((N, K))
+        for k in range(K):
+            parallel_config = self.group_configs[k]
+            f[:, k] = [compute_capability(x, parallel_config, self.max_bs)
+                       for x in model_datas]
+            d[:, k] = [self.compute_max_stage_mem(x, parallel_config, C)
+                       for x in model_datas]
 
         # 1. Create variables
-        p = LpVariable.matrix("p", (range(N), range(G)), cat="Binary")
+        m = Model(sense=MAXIMIZE, solver_name="CBC")
+        m.verbose = 0
+        p = [[m.add_var(var_type=BINARY) for j in range(G)] for i in range(N)]
         cap = [None] * N
-        min_tolerance = LpVariable("min_tolerance", lowBound=0)
-        sum_tolerance = LpVariable("sum_tolerance", lowBound=0)
-        s = LpVariable.matrix("s", (range(G), range(K)), cat="Binary")
-        pxs = LpVariable.matrix("pxs", (range(N), range(G), range(K)), cat="Binary")
+        min_tolerance = m.add_var(lb=0)
+        sum_tolerance = m.add_var(lb=0)
+        s = [[m.add_var(var_type=BINARY) for k in range(K)] for j in range(G)]
+        # pxs[i][j][k] = p[i][j] * s[j][k]
+        # Skip the variables whose capability is zero, because they never
+        # contribute to the objective.
+        pxs = [[[m.add_var(var_type=BINARY) if f[i, k] else None
+                 for k in range(K)] for j in range(G)] for i in range(N)]
 
         # 2. Objective
-        prob = LpProblem("myProblem", LpMaximize)
-        obj = min_tolerance + self.sum_k * sum_tolerance
-        prob += obj
+        m.objective = min_tolerance + self.sum_k * sum_tolerance
 
         # 3. Constraints
         # (a). memory budget on each GPU
+        # Skip the models whose weights are negligible
+        cC = [c[i] / C for i in range(N)]
+        active_i = [i for i in range(N) if cC[i] > eps]
         for j in range(G):
-            prob += (lpSum(p[i][j] * (c[i] / C) for i in range(N)) <=
-                     lpSum(s[j][k] * g[k] for k in range(K)))
+            m += (xsum(p[i][j] * cC[i] for i in active_i) <=
+                  xsum(s[j][k] * g[k] for k in range(K)))
 
         ## A more precise version, not used right now
         #for j in range(G):
-        #    prob += (lpSum(pxs[i][j][k] * (d[i][k] / C)
-        #                   for i in range(N) for k in range(K)) <= 1)
+        #    m += (xsum(pxs[i][j][k] * (d[i, k] / C)
+        #               for i in range(N) for k in range(K)) <= 1)
 
         # (b). capability
         for i in range(N):
-            cap[i] = lpSum(pxs[i][j][k] * f[i][k]
-                           for j in range(G) for k in range(K))
+            cap[i] = xsum(pxs[i][j][k] * f[i, k]
+                          for j in range(G) for k in range(K) if f[i, k])
 
         # (c). min tolerance and sum tolerance
         for i in range(N):
-            prob += min_tolerance <= cap[i] / a[i]
+            m += min_tolerance <= cap[i] / a[i]
 
-        prob += sum_tolerance == lpSum(cap[i] / a[i] for i in range(N))
+        m += sum_tolerance == xsum(cap[i] / a[i] for i in range(N))
 
         # (d). group size
-        prob += lpSum(s[j][k] * g[k] for j in range(G) for k in range(K)) == M
+        m += xsum(s[j][k] * g[k] for j in range(G) for k in range(K)) == M
 
         # (e). only one configuration
         for j in range(G):
-            prob += lpSum(s[j][k] for k in range(K)) == 1
+            m += xsum(s[j][k] for k in range(K)) == 1
 
         # (f). linearization
+        # pxs >= p + s - 1 is not needed. f and a are positive, so the
+        # objective never decreases with pxs and the solver can always
+        # push pxs up to p * s.
         for i in range(N):
             for j in range(G):
                 for k in range(K):
-                    prob += pxs[i][j][k] <= p[i][j]
-                    prob += pxs[i][j][k] <= s[j][k]
-                    prob += pxs[i][j][k] >= p[i][j] + s[j][k] - 1
-
-        assert "PULP_CBC_CMD" in pulp.listSolvers(onlyAvailable=True), (
-            "Please install ILP solvers by 'sudo apt install coinor-cbc'")
-
-        solver = pulp.PULP_CBC_CMD(mip=True,
-                                   msg=False,
-                                   timeLimit=self.time_limit,
-                                   threads=multiprocessing.cpu_count())
-        prob.solve(solver)
-
-        status = prob.status
-        objective = pulp.value(prob.objective)
+                    if f[i, k] == 0:
+                        continue
+                    m += pxs[i][j][k] <= p[i][j]
+                    m += pxs[i][j][k] <= s[j][k]
+
+        # Warm start from the last solution if only the rates are changed.
+        # The last solution is still feasible in this case.
+        structure = (N, G, K, C, tuple(c), tuple(g), f.tobytes(), d.tobytes())
+        if self.warm_start is not None and self.warm_start[0] == structure:
+            _, p_prev, s_prev = self.warm_start
+            start = [(p[i][j], p_prev[i][j]) for i in range(N) for j in range(G)]
+            start += [(s[j][k], int(s_prev[j] == k)) for j in range(G) for k in range(K)]
+            start += [(pxs[i][j][k], p_prev[i][j] * int(s_prev[j] == k))
+                      for i in range(N) for j in range(G) for k in range(K)
+                      if pxs[i][j][k] is not None]
+            m.start = start
+
+        m.threads = multiprocessing.cpu_count()
+        m.preprocess = self.preprocess
+        m.cuts = self.cuts
+        m.emphasis = self.emphasis
+        status = m.optimize(max_seconds=self.time_limit)
+
+        objective = m.objective_value
         objective = float(objective) if objective is not None else -1.0
         if self.verbose >= 2:
-            print(f"ILP Status: {LpStatus[status]}\tObjective: {objective}\t"
+            print(f"ILP Status: {status.name}\tObjective: {objective}\t"
                   f"Time: {time.time() - tic}")
 
-        if prob.status in [pulp.LpStatusInfeasible]:
+        if status in [OptimizationStatus.INFEASIBLE, OptimizationStatus.NO_SOLUTION_FOUND]:
             raise RuntimeError(
                 "Cannot run the function under the given memory budget. "
                 "Please increase the memory budget.")
 
         # Group configuration selection
-        s_res = []
-        for j in range(G):
-            assert sum(pulp.value(s[j][k]) for k in range(K)) == 1
-            for k in range(K):
-                if pulp.value(s[j][k]):
-                    s_res.append(k)
+        s_val = np.fromiter((s[j][k].x for j in range(G) for k in range(K)),
+                            dtype=np.float64, count=G * K).reshape(G, K)
+        assert np.all(np.round(s_val.sum(axis=1)) == 1)
+        s_res = s_val.argmax(axis=1).tolist()
 
         # Placement
-        p_res = np.zeros((N, G), dtype=np.int8)
-        for i in range(N):
-            for j in range(G):
-                if pulp.value(p[i][j]):
-                    p_res[i][j] = 1
+        p_res = np.fromiter((p[i][j].x > 0.5 for i in range(N) for j in range(G)),
+                            dtype=np.int8, count=N * G).reshape(N, G)
+
+        # Also kept when the solver stopped at the time limit (FEASIBLE).
+        # Such an incumbent may be suboptimal, but it is still a valid start.
+        self.warm_start = (structure, p_res, s_res)
 
         group_configs = []
         group_models = []
         for j in range(G):
             config_id = s_res[j]
             if self.group_sizes[config_id]:
-                tmp = []
-                for i in range(N):
-                    if p_res[i][j]:
-                        tmp.append(i)
                 group_configs.append(self.group_configs[config_id])
-                group_models.append(tmp)
+                group_models.append(np.nonzero(p_res[:, j])[0].tolist())
 
         return ModelPlacement(group_configs, group_models), {"objective": objective}
 
@@ -291,6 +326,83 @@ class ModelParallelismRR(BasePlacementPolicy):
         return sol, {}
 
 
+@contextmanager
+def single_thread_env():
+    """Set the thread counts of BLAS/OpenMP/numba to 1 in os.environ.
+    Processes spawned inside this block read them when they import numpy,
+    which avoids oversubscribing the CPUs. Libraries already loaded in the
+    current process are not affected."""
+    names = ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+             "NUMEXPR_NUM_THREADS", "NUMBA_NUM_THREADS"]
+    old_values = {name: os.environ.get(name) for name in names}
+    os.environ.update({name: "1" for name in names})
+    try:
+        yield
+    finally:
+        for name, value in old_values.items():
+            if value is None:
+                del os.environ[name]
+            else:
+                os.environ[name] = value
+
+
+def replica_placement_fast_greedy_local(init_sol: ModelPlacement,
+                                        model_datas: List[ModelData],
+                                        cluster_env: ClusterEnv,
+                                        workload: Workload,
+                                        evaluator_method: str,
+                                        verbose: int):
+    """Run replica_placement_fast_greedy in a worker of a local process pool."""
+    evaluator = PlacementEvaluator(model_datas, cluster_env, workload,
+                                   evaluator_method, False)
+    return replica_placement_fast_greedy(init_sol, model_datas, cluster_env,
+                                         workload, evaluator, verbose)
+
+
+@lru_cache(maxsize=32)
+def _enumerate_uneven_group_config_tuples(num_devices: int,
+                                          num_devices_per_node: int,
+                                          max_pp: int, max_op: int):
+    """Enumerate (pp, op, num_reg_groups, quo_groups) of the regular groups
+    and the leftover power-of-two groups."""
+    ret = []
+    for group_size in get2tok(num_devices):
+        if group_size > num_devices_per_node and group_size % num_devices_per_node != 0:
+            continue
+        num_reg_groups = num_devices // group_size
+        quo_groups = tuple(decompose2tok(num_devices % group_size))
+
+        for pp in get_factors(group_size):
+            op = group_size // pp
+
+            if pp > max_pp or op > max_op:
+                continue
+
+            ret.append((pp, op, num_reg_groups, quo_groups))
+    return tuple(ret)
+
+
+@lru_cache(maxsize=32)
+def _enumerate_group_config_tuples(num_devices: int,
+                                   num_devices_per_node: int,
+                                   max_pp: int, max_op: int):
+    """Enumerate (group_size, pp, op, num_groups) of equal-sized groups."""
+    ret = []
+    for group_size in get_factors(num_devices):
+        if group_size > num_devices_per_node and group_size % num_devices_per_node != 0:
+            continue
+
+        for pp in get_factors(group_size):
+            op = group_size // pp
+            num_groups = num_devices // group_size
+
+            if pp > max_pp or op > max_op:
+                continue
+
+            ret.append((group_size, pp, op, num_groups))
+    return tuple(ret)
+
+
 class ModelParallelismSearch(BasePlacementPolicy):
 
     def __init__(self,
@@ -314,6 +426,8 @@ class ModelParallelismSearch(BasePlacementPolicy):
         self.evaluator_method = "fast_simulator"
         self.parallel_evaluator = False
         self.parallel_initial_placement = False
+        # Run the initial placements in a local process pool instead of ray
+        self.local_parallel_initial_placement = False
 
         if ((self.parallel_evaluator or self.parallel_initial_placement)
             and not ray.is_initialized()):
@@ -337,6 +451,21 @@ class ModelParallelismSearch(BasePlacementPolicy):
                     initial_sols[i], model_datas, cluster_env, train_workload, None,
                     self.verbose)
             initial_sols = ray.get(initial_sols)
+        elif self.local_parallel_initial_placement:
+            # The replica placements are independent, so run them in a
+            # local process pool. This avoids the overhead of ray.
+            num_workers = min(os.cpu_count(), len(initial_sols))
+            func = partial(replica_placement_fast_greedy_local,
+                           model_datas=model_datas, cluster_env=cluster_env,
+                           workload=train_workload,
+                           evaluator_method=self.evaluator_method,
+                           verbose=self.verbose)
+            chunksize = max(1, len(initial_sols) // (num_workers + 2))
+            with single_thread_env(), ProcessPoolExecutor(
+                    max_workers=num_workers,
+                    mp_context=multiprocessing.get_context("spawn")) as executor:
+                initial_sols = list(executor.map(func, initial_sols,
+                                                 chunksize=chunksize))
         else:
             for i in range(len(initial_sols)):
                 initial_sols[i] = replica_placement_fast_greedy(
@@ -458,45 +587,22 @@ class ModelParallelismSearch(BasePlacementPolicy):
 
     def enumerate_group_configs_uneven(self, cluster_env: ClusterEnv):
         sols = []
-        num_devices = cluster_env.num_devices
-        num_devices_per_node = cluster_env.num_devices_per_node
-
-        for group_size in get2tok(num_devices):
-            if group_size > num_devices_per_node and group_size % num_devices_per_node != 0:
-                continue
-            num_reg_groups = num_devices // group_size
-            quo_groups = decompose2tok(num_devices % group_size)
-
-            for pp in get_factors(group_size):
-                op = group_size // pp
-
-                if pp > self.max_pp or op > self.max_op:
-                    continue
-
-                sols.append(ModelPlacement([ParallelConfig(1, op, pp)] * num_reg_groups +
-                                           [ParallelConfig(1, 1, s) for s in quo_groups],
-                                           [[] for _ in range(num_reg_groups + len(quo_groups))]))
+        for pp, op, num_reg_groups, quo_groups in _enumerate_uneven_group_config_tuples(
+                cluster_env.num_devices, cluster_env.num_devices_per_node,
+                self.max_pp, self.max_op):
+            sols.append(ModelPlacement([ParallelConfig(1, op, pp)] * num_reg_groups +
+                                       [ParallelConfig(1, 1, s) for s in quo_groups],
+                                       [[] for _ in range(num_reg_groups + len(quo_groups))]))
         return sols
 
 
     def enumerate_group_configs(self, cluster_env):
         sols = []
-        num_devices = cluster_env.num_devices
-        num_devices_per_node = cluster_env.num_devices_per_node
-
-        for group_size in get_factors(num_devices):
-            if group_size > num_devices_per_node and group_size % num_devices_per_node != 0:
-                continue
-
-            for pp in get_factors(group_size):
-                op = group_size // pp
-                num_groups = num_devices // group_size
-
-                if pp > self.max_pp or op > self.max_op:
-                    continue
-
-                sols.append(ModelPlacement([ParallelConfig(1, op, pp)] * num_groups,
-                                           [[] for _ in range(num_groups)]))
+        for _, pp, op, num_groups in _enumerate_group_config_tuples(
+                cluster_env.num_devices, cluster_env.num_devices_per_node,
+                self.max_pp, self.max_op):
+            sols.append(ModelPlacement([ParallelConfig(1, op, pp)] * num_groups,
+                                       [[] for _ in range(num_groups)]))
         return sols
 
     def greedy_group_configs(self,
@@ -525,9 +631,12 @@ class ModelParallelismSearch(BasePlacementPolicy):
                         continue
 
                     for sol in beam_sols[cur_num - last_group_size]:
-                        pre_sol = sol.copy()
-                        pre_sol.group_configs.append(ParallelConfig(1, op, pp))
-                        pre_sol.group_models = [[] for _ in range(len(pre_sol.group_configs))]
+                        # The models are re-placed from scratch, so only the
+                        # group configs of the previous solution are needed
+                        group_configs = list(sol.group_configs)
+                        group_configs.append(ParallelConfig(1, op, pp))
+                        pre_sol = ModelPlacement(group_configs,
+                                                 [[] for _ in range(len(group_configs))])
 
                         #new_sol = replica_placement_on_last_group(
                         #new_sol = replica_placement_beam_search(
@@ -6,6 +6,8 @@ import json
 import pickle
 from typing import List, Dict, Union, Any
 
+import numpy as np
+
 from alpa_serve.util import GB
 
 
@@ -26,8 +28,34 @@ class LatencyMemData:
     weight_mem: List
     # Metadata for parallel strategy
     metadata: Any = None
+    # Cached numpy arrays of the latency table
+    # Type: Tuple[batch_sizes, sum_stage_latency, max_stage_latency]
+    _latency_arrays: Any = dataclasses.field(
+        default=None, init=False, repr=False, compare=False)
+    # Cached results of compute_capability in model_parallelism.py
+    # Type: Dict[(slo, max_bs) -> capability]
+    _capability_cache: Dict = dataclasses.field(
+        default=None, init=False, repr=False, compare=False)
+
+    def get_latency_arrays(self):
+        """Return the batch sizes and the sum/max of the stage latencies
+        for each batch size as numpy arrays."""
+        if self._latency_arrays is None:
+            batch_sizes = np.array(list(self.latency.keys()))
+            sum_latency = np.array([sum(ls) for ls in self.latency.values()])
+            max_latency = np.array([max(ls) for ls in self.latency.values()])
+            self._latency_arrays = (batch_sizes, sum_latency, max_latency)
+        return self._latency_arrays
+
+    def get_capability_cache(self):
+        """Return the dict that caches the capability of this table."""
+        if self._capability_cache is None:
+            self._capability_cache = {}
+        return self._capability_cache
 
     def add_result(self, batch_size: int, latency: List[float], act_mem: List[float], weight_mem: List[float], metadata: Any = None):
+        self._latency_arrays = None
+        self._capability_cache = None
         if batch_size not in self.latency:
             self.latency[batch_size] = latency
             self.act_mem[batch_size] = act_mem
@@ -71,6 +71,7 @@ def write_tsv(heads: Sequence[str],
         print(line)
 
 
+@functools.lru_cache(maxsize=1024)
 def get_factors(n: int):
     step = 2 if n % 2 else 1
     ret = list(
@@ -82,7 +83,8 @@ def get_factors(n: int):
         )
     )
     ret.sort()
-    return ret
+    # Return a tuple because the result is shared by the cache
+    return tuple(ret)
 
 
 def to_str_round(x: Any, decimal: int = 6):
@@ -1,35 +1,37 @@
 import argparse
-from collections import defaultdict
+import csv
 
 import numpy as np
 import matplotlib
 import matplotlib.pyplot as plt
+import pandas as pd
 
-from benchmarks.alpa.equal_model_case import read_equal_model_case_tsv
+from benchmarks.alpa.equal_model_case import _DATA_HEADS
 from benchmarks.alpa.plot_various_metrics import show_name, method2color, method2order
 
+XTICKS = (0.3, 0.5, 1, 2, 4, 8, 16)
 
-def read_data(filename):
-    # Dict[policy -> Dict[slo_scale -> goodput]]
-    data = defaultdict(lambda: defaultdict(dict))
-
-    rate = cv = None
-
-    for line in read_equal_model_case_tsv(filename):
-        policy, slo_scale, goodput, total_rate, kwargs, mode = (
-            line["policy_name"], line["slo_scale"], line["goodput"],
-            line["total_rate"], line["arrival_process_kwargs"], line["mode"])
 
-        if rate is None:
-            rate = total_rate
-        cv = kwargs["cv"] if kwargs else 1
-
-        if mode == "simulate":
-            policy = policy
-        else:
-            policy = policy + "-real"
+def read_data(filename):
+    # Keep "None" kwargs as a string for eval, and only skip lines that
+    # start with "#", like read_equal_model_case_tsv.
+    df = pd.read_csv(filename, sep="\t", header=None, names=_DATA_HEADS,
+                     keep_default_na=False, quoting=csv.QUOTE_NONE,
+                     dtype={"exp_name": str, "arrival_process_kwargs": str})
+    df = df[~df["exp_name"].str.lstrip().str.startswith("#")]
+    if df.empty:
+        return {}, {"total_rate": None, "per_model_cv": None}
+
+    rate = float(df["total_rate"].iloc[0])
+    kwargs = eval(df["arrival_process_kwargs"].iloc[-1])
+    cv = kwargs["cv"] if kwargs else 1
+
+    policy = df["policy_name"].where(df["mode"] == "simulate",
+                                     df["policy_name"] + "-real")
 
-        data[policy][slo_scale] = goodput
+    # Dict[policy -> Dict[slo_scale -> goodput]]
+    data = {p: dict(zip(g["slo_scale"].astype(float), g["goodput"].astype(float)))
+            for p, g in df.groupby(policy, sort=False)}
 
     return data, {"total_rate": rate, "per_model_cv": cv}
 
@@ -41,35 +43,34 @@ def plot_goodput_vs_slo(data, title, output, show):
     methods = list(data.keys())
     methods.sort(key=lambda x: method2order(x))
 
-    curves = []
-    legends = []
-    x_max = 0
-    y_max = 0
-    for method in methods:
-        curve = data[method]
-        xs, ys = zip(*curve.items())
-        xs, ys = np.array(xs), np.array(ys) * 100
-        indices = np.argsort(xs)
-        xs, ys = xs[indices], ys[indices]
+    # One column per method. Each method keeps its own sorted SLO scales,
+    # padded with trailing NaNs, so a sparse curve is never split into pieces.
+    num_points = max((len(data[method]) for method in methods), default=0)
+    xs = np.full((num_points, len(methods)), np.nan)
+    ys = np.full((num_points, len(methods)), np.nan)
+    for j, method in enumerate(methods):
+        points = sorted(data[method].items())
+        xs[:len(points), j] = [x for x, _ in points]
+        ys[:len(points), j] = [y * 100 for _, y in points]
+
+    curves = ax.plot(xs, ys, "-*") if methods else []
+    for curve, method in zip(curves, methods):
+        curve.set_color(method2color(method))
         if "batch" in method:
-            curve = ax.plot(xs, ys, "--*", color=method2color(method))
-        else:
-            curve = ax.plot(xs, ys, "-*", color=method2color(method))
-
-        curves.append(curve[0])
-        legends.append(show_name(method))
+            curve.set_linestyle("--")
+        elif "-real" in method:
+            curve.set_linestyle(":")
+    legends = [show_name(method) for method in methods]
 
-        x_max = max(x_max, *xs)
-        y_max = max(y_max, *ys)
+    y_max = np.nanmax(ys) if ys.size else 0
 
     ax.set_ylim(bottom=0, top=max(y_max * 1.05, 100))
     ax.set_xlim(left=0.3, right=16)
     ax.set_ylabel("Goodput (%)")
     ax.set_xlabel("SLO scale (x)")
     ax.set_xscale("log")
-    xticks = [0.3, 0.5, 1, 2, 4, 8, 16]
-    ax.set_xticks(xticks)
-    ax.set_xticklabels(xticks)
+    ax.set_xticks(XTICKS)
+    ax.set_xticklabels(XTICKS)
     ax.set_xticks([], minor=True)
     ax.legend(curves, legends)
     ax.set_title(title)
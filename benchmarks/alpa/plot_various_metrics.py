@@ -1,5 +1,6 @@
 import argparse
 from collections import defaultdict
+import zlib
 
 import numpy as np
 import matplotlib
@@ -52,18 +53,6 @@ def show_name(name):
     return show_name_dict.get(name, name) + suffix
 
 
-method2color_dict = {
-}
-
-ct = 0
-def method2color(name):
-    global ct
-    if name not in method2color_dict:
-        method2color_dict[name] = f"C{ct}"
-        ct += 1
-    return method2color_dict[name]
-
-
 method_order_list = [
     "mp-ilp", "mp-search", "mp-search-sep",
     "sr-replace-30", "sr-replace-60", "sr-replace-120", "sr-replace-3600", "sr-replace-5400", "sr-replace-10800", "sr-replace-21600",
@@ -71,6 +60,26 @@ method_order_list = [
     "mp-greedy-2", "mp-greedy-4", "mp-greedy-8", "mp-greedy-16",
     "mp-equal-16-1", "mp-equal-8-2", "mp-equal-4-4", "mp-equal-2-8",
 ]
+method_order_dict = {name: i for i, name in enumerate(method_order_list)}
+
+# Fixed colors so that a method has the same color in every plot.
+# The "CN" colors wrap around every 10, so use a larger palette.
+COLOR_PALETTE = [matplotlib.colors.to_hex(c) for c in
+                 plt.get_cmap("tab10").colors + plt.get_cmap("tab20b").colors]
+METHOD2COLOR = {name: COLOR_PALETTE[i] for i, name in enumerate(
+    method_order_list + [x for x in show_name_dict if "-batch" in x])}
+# Colors for the methods not listed above
+UNKNOWN_METHOD_COLORS = [matplotlib.colors.to_hex(c) for c in
+                         plt.get_cmap("tab20c").colors]
+
+def method2color(name):
+    name = name.replace("-real", "")
+    if name not in METHOD2COLOR and "-batch" in name:
+        name = name[:name.find("-batch")]
+    if name in METHOD2COLOR:
+        return METHOD2COLOR[name]
+    return UNKNOWN_METHOD_COLORS[zlib.crc32(name.encode()) % len(UNKNOWN_METHOD_COLORS)]
+
 
 def method2order(name):
     if "-real" in name:
@@ -81,7 +90,7 @@ def method2order(name):
         delta = len(method_order_list) * 2
     else:
         delta = 0
-    return method_order_list.index(name) + delta
+    return method_order_dict.get(name, len(method_order_list)) + delta
 
 
 def plot_goodput_common(data, threshold, increasing, xlabel, title, output, show):
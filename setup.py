@@ -4,6 +4,7 @@ install_requires = [
     "numba",
     "scipy",
     "pulp",
+    "mip",
     "matplotlib",
     "starlette",
     "uvicorn",
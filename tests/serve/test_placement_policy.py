@@ -6,7 +6,7 @@ import numpy as np
 from alpa_serve.simulator.controller import Controller
 from alpa_serve.placement_policy import (ModelData, ClusterEnv,
     SelectiveReplicationGreedy, SelectiveReplicationSearch,
-    ModelParallelismGreedy, ModelParallelismSearch)
+    ModelParallelismGreedy, ModelParallelismSearch, ModelParallelismILP)
 from alpa_serve.profiling import ParallelConfig, load_test_prof_result
 from alpa.util import GB
 
@@ -76,6 +76,43 @@ class PlacementPolicyTest(unittest.TestCase):
             assert placement.group_configs[0].pp == 4
             assert list(placement.group_models[0]) == [0, 1, 2, 3]
 
+    def test_model_parallelism_ilp(self):
+        cluster_env = ClusterEnv(num_devices=4, mem_budget=4.5*GB)
+        model_datas = [
+            ModelData("m0", 1, 5, 1, load_test_prof_result("test-2GB-100ms")),
+            ModelData("m1", 1, 5, 1, load_test_prof_result("test-2GB-100ms")),
+            ModelData("m2", 1, 5, 1, load_test_prof_result("test-2GB-100ms")),
+            ModelData("m3", 1, 5, 1, load_test_prof_result("test-2GB-100ms")),
+        ]
+
+        policy = ModelParallelismILP()
+        placement, _ = policy.solve_placement(model_datas, cluster_env)
+
+        assert len(placement.group_configs) == 2
+        assert placement.group_configs[0].pp == 2
+        assert placement.group_configs[1].pp == 2
+        assert placement.group_models[0] == [0, 1, 2, 3]
+        assert placement.group_models[1] == [0, 1, 2, 3]
+
+        # Only change the rates, so the second solve is warm started
+        assert policy.warm_start is not None
+        model_datas = [
+            ModelData("m0", 1, 1, 1, load_test_prof_result("test-2GB-100ms")),
+            ModelData("m1", 1, 1, 1, load_test_prof_result("test-2GB-100ms")),
+            ModelData("m2", 1, 9, 1, load_test_prof_result("test-2GB-100ms")),
+            ModelData("m3", 1, 9, 1, load_test_prof_result("test-2GB-100ms")),
+        ]
+        placement, debug_info = policy.solve_placement(model_datas, cluster_env)
+        _, cold_debug_info = ModelParallelismILP().solve_placement(
+            model_datas, cluster_env)
+
+        # The order of the groups is not unique
+        groups = sorted(zip(placement.group_configs, placement.group_models))
+        assert groups == [(ParallelConfig(1, 1, 1), [2, 3]),
+                          (ParallelConfig(1, 1, 1), [2, 3]),
+                          (ParallelConfig(1, 1, 2), [0, 1, 2, 3])]
+        assert abs(debug_info["objective"] - cold_debug_info["objective"]) < 1e-6
+
     def test_placement_api(self):
         for policy in [SelectiveReplicationGreedy(), ModelParallelismGreedy()]:
             controller = Controller()
@@ -99,6 +136,7 @@ def suite():
     suite.addTest(PlacementPolicyTest("test_selective_replication"))
     suite.addTest(PlacementPolicyTest("test_model_parallelism"))
     suite.addTest(PlacementPolicyTest("test_model_parallelism_search"))
+    suite.addTest(PlacementPolicyTest("test_model_parallelism_ilp"))
     suite.addTest(PlacementPolicyTest("test_placement_api"))
     return suite
 